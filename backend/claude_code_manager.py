@@ -1,18 +1,28 @@
 """
 Claude Code Process Manager
 
-Manages a subprocess running the Claude Code CLI (`claude` command) for
+Manages subprocesses running the Claude Code CLI (`claude` command) for
 executing coding tasks. Provides streaming output and lifecycle management.
 """
 
 import asyncio
 import logging
+import os
 import signal
 from asyncio.subprocess import Process
-from typing import AsyncGenerator, Optional
+from typing import AsyncGenerator, List, Optional, Set
+
+import orjson
 
 logger = logging.getLogger(__name__)
 
+# Size of each stderr read, and the StreamReader buffer limit for the pipes
+# (which also bounds the length of one stream-json event line).
+_READ_CHUNK_SIZE = 64 * 1024
+_STREAM_LIMIT = 4 * 1024 * 1024
+# Maximum number of stderr bytes retained for error reporting.
+_STDERR_CAP = 1024 * 1024
+
 
 class ClaudeCodeError(Exception):
     """Base exception for Claude Code manager errors."""
@@ -29,9 +39,45 @@ class ProcessCommunicationError(ClaudeCodeError):
     pass
 
 
+async def _drain(stream: asyncio.StreamReader, buf: bytearray) -> None:
+    """
+    Read a pipe to EOF, keeping at most _STDERR_CAP bytes in buf.
+
+    Reading continuously keeps the child from blocking on a full pipe;
+    anything past the cap is read and discarded.
+    """
+    while True:
+        chunk = await stream.read(_READ_CHUNK_SIZE)
+        if not chunk:
+            return
+        room = _STDERR_CAP - len(buf)
+        if room > 0:
+            buf += chunk[:room]
+
+
+class _ClaudeProcess:
+    """A started `claude` process and the task draining its stderr."""
+
+    def __init__(self, process: Process):
+        self.process = process
+        self.stderr_buf = bytearray()
+        # Drain stderr for the life of the process so a chatty child can't
+        # deadlock on a full pipe while we're reading stdout
+        self.stderr_task = asyncio.create_task(_drain(process.stderr, self.stderr_buf))
+
+    def signal_group(self, sig: int) -> None:
+        """
+        Send a signal to the process and everything it spawned.
+
+        The process is started as a session leader, so its PID is also the
+        process group ID.
+        """
+        os.killpg(self.process.pid, sig)
+
+
 class ClaudeCodeManager:
     """
-    Manages the lifecycle of a Claude Code CLI subprocess.
+    Manages the lifecycle of Claude Code CLI subprocesses.
 
     This class handles:
     - Spawning the `claude` CLI process
@@ -39,6 +85,10 @@ class ClaudeCodeManager:
     - Graceful shutdown and cleanup
     - Error handling for process failures
 
+    Each task runs in its own process, so tasks never share a conversation.
+    The process for the next task is started as soon as a task finishes,
+    which keeps CLI startup off the critical path of the next request.
+
     Example:
         ```python
         manager = ClaudeCodeManager()
@@ -57,76 +107,40 @@ class ClaudeCodeManager:
                           which assumes it's in the system PATH.
         """
         self.claude_binary = claude_binary
-        self._process: Optional[Process] = None
-        self._is_running = False
+        # Idle process started ahead of the next task
+        self._spare: Optional[_ClaudeProcess] = None
+        # Processes currently running a task
+        self._active: Set[_ClaudeProcess] = set()
 
     @property
     def is_running(self) -> bool:
-        """Check if the Claude Code process is currently running."""
-        return self._is_running and self._process is not None
+        """Check if a Claude Code task is currently running."""
+        return bool(self._active)
 
-    async def run_task(self, prompt: str) -> AsyncGenerator[str, None]:
+    async def _spawn(self) -> _ClaudeProcess:
         """
-        Execute a coding task using Claude Code and stream the output.
-
-        This method spawns a new `claude` CLI process with the given prompt,
-        streams the output line by line, and properly cleans up when done.
+        Start a `claude` process ready to take one task.
 
-        Args:
-            prompt: The task description to send to Claude Code.
-
-        Yields:
-            str: Lines of output from the Claude Code process.
-
-        Raises:
-            ProcessStartError: If the process fails to start.
-            ProcessCommunicationError: If communication with the process fails.
-
-        Example:
-            ```python
-            manager = ClaudeCodeManager()
-            async for line in manager.run_task("Fix the bug in auth.py"):
-                print(line)
-            ```
+        The CLI is run in print mode with stream-json input and output: it
+        reads a JSON user message from stdin and answers with JSON events
+        ending in a `result` event. Each process is only ever sent one
+        message.
         """
         try:
-            # Start the Claude Code process
-            self._process = await asyncio.create_subprocess_exec(
+            process = await asyncio.create_subprocess_exec(
                 self.claude_binary,
-                prompt,
+                "-p",
+                "--input-format", "stream-json",
+                "--output-format", "stream-json",
+                "--verbose",
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE,
                 stdin=asyncio.subprocess.PIPE,
+                limit=_STREAM_LIMIT,
+                # Own process group, so stop()/kill() also reach any helper
+                # processes the CLI spawns
+                start_new_session=True,
             )
-            self._is_running = True
-            logger.info(f"Started Claude Code process (PID: {self._process.pid})")
-
-            # Stream stdout
-            if self._process.stdout:
-                async for line in self._process.stdout:
-                    decoded_line = line.decode('utf-8', errors='replace')
-                    yield decoded_line
-
-            # Wait for process to complete
-            return_code = await self._process.wait()
-
-            # Check for errors
-            if return_code != 0:
-                stderr_output = ""
-                if self._process.stderr:
-                    stderr_data = await self._process.stderr.read()
-                    stderr_output = stderr_data.decode('utf-8', errors='replace')
-
-                logger.error(
-                    f"Claude Code process exited with code {return_code}. "
-                    f"stderr: {stderr_output}"
-                )
-                raise ProcessCommunicationError(
-                    f"Process exited with code {return_code}: {stderr_output}"
-                )
-
-            logger.info(f"Claude Code process completed successfully")
-
         except FileNotFoundError:
             error_msg = (
                 f"Claude CLI binary '{self.claude_binary}' not found. "
@@ -135,96 +149,215 @@ class ClaudeCodeManager:
             logger.error(error_msg)
             raise ProcessStartError(error_msg)
 
-        except Exception as e:
-            logger.error(f"Error running Claude Code task: {e}")
-            raise ProcessCommunicationError(f"Failed to run task: {e}")
-
-        finally:
-            self._is_running = False
-            self._process = None
+        logger.info("Started Claude Code process (PID: %s)", process.pid)
+        return _ClaudeProcess(process)
+
+    async def _take_process(self) -> _ClaudeProcess:
+        """Return the spare process if it is still alive, else start one."""
+        spare, self._spare = self._spare, None
+        if spare is not None:
+            if spare.process.returncode is None:
+                return spare
+            spare.stderr_task.cancel()
+        return await self._spawn()
+
+    async def _prestart(self) -> None:
+        """Start the spare process for the next task, if there isn't one."""
+        if self._spare is not None:
+            return
+        try:
+            claude = await self._spawn()
+        except ClaudeCodeError:
+            # Already logged; the next task will try again
+            return
+        if self._spare is None:
+            self._spare = claude
+        else:
+            # Another finished task started one in the meantime
+            await self._kill_process(claude)
 
-    async def stop(self, timeout: float = 5.0) -> None:
+    async def run_task(self, prompt: str) -> AsyncGenerator[str, None]:
         """
-        Gracefully stop the Claude Code process.
+        Execute a coding task using Claude Code and stream the output.
 
-        Sends SIGTERM to the process and waits for it to exit. If it doesn't
-        exit within the timeout, sends SIGKILL to force termination.
+        This method sends the prompt to a fresh `claude` process (usually
+        one started in advance) and streams the text of Claude's replies as
+        they arrive, until the process reports the end of the turn. The
+        process is then discarded. Concurrent callers each get their own
+        process.
 
         Args:
-            timeout: Maximum time in seconds to wait for graceful shutdown.
-                    Defaults to 5.0 seconds.
+            prompt: The task description to send to Claude Code.
+
+        Yields:
+            str: Chunks of output from the Claude Code process.
+
+        Raises:
+            ProcessStartError: If the process fails to start.
+            ProcessCommunicationError: If communication with the process fails.
+
+        Example:
+            ```python
+            manager = ClaudeCodeManager()
+            async for chunk in manager.run_task("Fix the bug in auth.py"):
+                print(chunk, end="")
+            ```
         """
-        if not self._process:
-            logger.debug("No process to stop")
-            return
+        claude = await self._take_process()
+        process = claude.process
+        self._active.add(claude)
 
-        if self._process.returncode is not None:
-            logger.debug("Process already terminated")
-            self._is_running = False
-            self._process = None
-            return
+        try:
+            message = {
+                "type": "user",
+                "message": {
+                    "role": "user",
+                    "content": [{"type": "text", "text": prompt}],
+                },
+            }
+            process.stdin.write(orjson.dumps(message) + b"\n")
+            await process.stdin.drain()
+
+            while True:
+                line = await process.stdout.readline()
+                if not line:
+                    return_code = await process.wait()
+                    stderr_output = claude.stderr_buf.decode('utf-8', errors='replace')
+                    logger.error(
+                        "Claude Code process exited with code %s. stderr: %s",
+                        return_code,
+                        stderr_output,
+                    )
+                    raise ProcessCommunicationError(
+                        f"Process exited with code {return_code}: {stderr_output}"
+                    )
+
+                event = orjson.loads(line)
+                if event.get("type") == "assistant":
+                    for block in event["message"].get("content", []):
+                        if block.get("type") == "text" and block.get("text"):
+                            yield block["text"]
+                elif event.get("type") == "result":
+                    if event.get("is_error"):
+                        raise ProcessCommunicationError(
+                            f"Task failed: {event.get('result') or event.get('subtype')}"
+                        )
+                    break
+
+            logger.info("Claude Code task completed successfully")
+            await self._prestart()
+
+        except ClaudeCodeError:
+            raise
+
+        except Exception as e:
+            logger.error("Error running Claude Code task: %s", e)
+            raise ProcessCommunicationError(f"Failed to run task: {e}")
 
+        finally:
+            # The process has served its one task (or the caller stopped
+            # iterating mid-turn); nothing of it is reused
+            self._active.discard(claude)
+            await self._kill_process(claude)
+
+    async def _stop_process(self, claude: _ClaudeProcess, timeout: float) -> None:
+        """SIGTERM a process group, escalating to SIGKILL after `timeout`."""
+        process = claude.process
         try:
-            logger.info(f"Stopping Claude Code process (PID: {self._process.pid})")
+            if process.returncode is not None:
+                logger.debug("Process already terminated")
+                return
+
+            logger.info("Stopping Claude Code process (PID: %s)", process.pid)
 
             # Send SIGTERM for graceful shutdown
-            self._process.send_signal(signal.SIGTERM)
+            claude.signal_group(signal.SIGTERM)
 
             try:
                 # Wait for process to exit
-                await asyncio.wait_for(self._process.wait(), timeout=timeout)
+                await asyncio.wait_for(process.wait(), timeout=timeout)
                 logger.info("Process stopped gracefully")
             except asyncio.TimeoutError:
                 # Force kill if timeout exceeded
                 logger.warning(
-                    f"Process did not stop within {timeout}s, sending SIGKILL"
+                    "Process did not stop within %ss, sending SIGKILL", timeout
                 )
-                self._process.kill()
-                await self._process.wait()
+                claude.signal_group(signal.SIGKILL)
+                await process.wait()
                 logger.info("Process forcefully terminated")
 
         except ProcessLookupError:
             logger.debug("Process already terminated")
 
         except Exception as e:
-            logger.error(f"Error stopping process: {e}")
+            logger.error("Error stopping process: %s", e)
 
         finally:
-            self._is_running = False
-            self._process = None
-
-    async def kill(self) -> None:
-        """
-        Forcefully terminate the Claude Code process.
-
-        Sends SIGKILL to immediately terminate the process without cleanup.
-        Use stop() for graceful shutdown when possible.
-        """
-        if not self._process:
-            logger.debug("No process to kill")
-            return
-
-        if self._process.returncode is not None:
-            logger.debug("Process already terminated")
-            self._is_running = False
-            self._process = None
-            return
+            claude.stderr_task.cancel()
 
+    async def _kill_process(self, claude: _ClaudeProcess) -> None:
+        """SIGKILL a process group and wait for the process to exit."""
+        process = claude.process
         try:
-            logger.warning(f"Killing Claude Code process (PID: {self._process.pid})")
-            self._process.kill()
-            await self._process.wait()
-            logger.info("Process killed")
+            if process.returncode is not None:
+                logger.debug("Process already terminated")
+                return
+
+            logger.debug("Killing Claude Code process (PID: %s)", process.pid)
+            claude.signal_group(signal.SIGKILL)
+            await process.wait()
 
         except ProcessLookupError:
             logger.debug("Process already terminated")
 
         except Exception as e:
-            logger.error(f"Error killing process: {e}")
+            logger.error("Error killing process: %s", e)
 
         finally:
-            self._is_running = False
-            self._process = None
+            claude.stderr_task.cancel()
+
+    def _take_all(self) -> List[_ClaudeProcess]:
+        """Detach the spare and all running processes from the manager."""
+        processes = list(self._active)
+        if self._spare is not None:
+            processes.append(self._spare)
+        self._spare = None
+        self._active.clear()
+        return processes
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """
+        Gracefully stop all Claude Code processes.
+
+        Sends SIGTERM to each process group and waits for the processes to
+        exit. Any that don't exit within the timeout are sent SIGKILL to
+        force termination.
+
+        Args:
+            timeout: Maximum time in seconds to wait for graceful shutdown.
+                    Defaults to 5.0 seconds.
+        """
+        processes = self._take_all()
+        if not processes:
+            logger.debug("No process to stop")
+            return
+        await asyncio.gather(*(self._stop_process(p, timeout) for p in processes))
+
+    async def kill(self) -> None:
+        """
+        Forcefully terminate all Claude Code processes.
+
+        Sends SIGKILL to each process group to immediately terminate it
+        without cleanup.
+        Use stop() for graceful shutdown when possible.
+        """
+        processes = self._take_all()
+        if not processes:
+            logger.debug("No process to kill")
+            return
+        logger.warning("Killing %s Claude Code process(es)", len(processes))
+        await asyncio.gather(*(self._kill_process(p) for p in processes))
+        logger.info("Processes killed")
 
     async def __aenter__(self):
         """Context manager entry."""
@@ -1,18 +1,21 @@
 from __future__ import annotations
 
 import asyncio
+import functools
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Any
+from typing import Any, AsyncIterator
 
 import httpx
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
-from starlette.responses import Response
+from starlette.background import BackgroundTask
+from starlette.responses import Response, StreamingResponse
 
-from opus_computer import run_opus_task_in_container
+from opus_computer import run_opus_task_in_container, shutdown as shutdown_opus_computer
 
 _BASE_DIR = Path(__file__).resolve().parent
 load_dotenv(_BASE_DIR / ".env")
@@ -27,6 +30,19 @@ def _get_openai_api_key() -> str:
     return api_key
 
 
+_OPENAI_CLIENT_SECRETS_URL = "https://api.openai.com/v1/realtime/client_secrets"
+
+
+@functools.cache
+def _openai_headers() -> dict[str, str]:
+    # Built once on first successful call; a missing key raises and is not
+    # cached, so adding it to the environment later still works.
+    return {
+        "Authorization": f"Bearer {_get_openai_api_key()}",
+        "Content-Type": "application/json",
+    }
+
+
 class EphemeralKeyRequest(BaseModel):
     model: str = Field(default="gpt-realtime")
     voice: str = Field(default="verse")
@@ -34,25 +50,34 @@ class EphemeralKeyRequest(BaseModel):
     expires_after_anchor: str = Field(default="created_at")
 
 
-class EphemeralKeyResponse(BaseModel):
-    apiKey: str
-    expires_at: int | None = None
-    session: dict[str, Any] | None = None
-
-
 class OpusComputerTaskRequest(BaseModel):
     task: str = Field(min_length=1)
     timeout_seconds: int = Field(default=600, ge=10, le=1800)
     container: str | None = None
     model: str | None = None
     tool_version: str | None = None
+    max_steps: int = Field(default=50, ge=1, le=500)
+    max_output_bytes: int = Field(default=256 * 1024, ge=1024, le=4 * 1024 * 1024)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # One pooled client for the app's lifetime so the OpenAI call and the
+    # computer-demo proxy reuse keep-alive connections instead of paying a
+    # fresh TCP/TLS handshake on every request.
+    app.state.http = httpx.AsyncClient(
+        timeout=30,
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=64, max_connections=128),
+    )
+    try:
+        yield
+    finally:
+        await app.state.http.aclose()
+        await shutdown_opus_computer()
 
 
-class OpusComputerTaskResponse(BaseModel):
-    output: str
-
-
-app = FastAPI(title="Realtime Ephemeral Key Backend")
+app = FastAPI(title="Realtime Ephemeral Key Backend", lifespan=lifespan)
 
 _cors_origins = [
     origin.strip()
@@ -100,13 +125,18 @@ async def proxy_computer_demo(request: Request, path: str = "") -> Response:
     if user_agent:
         forward_headers["user-agent"] = user_agent
 
-    async with httpx.AsyncClient(timeout=30, follow_redirects=True) as client:
-        upstream_resp = await client.request(
-            method=request.method,
-            url=upstream_url,
-            params=dict(request.query_params),
-            headers=forward_headers,
-        )
+    client: httpx.AsyncClient = request.app.state.http
+    upstream_req = client.build_request(
+        method=request.method,
+        url=upstream_url,
+        params=dict(request.query_params),
+        headers=forward_headers,
+    )
+    # Stream the body through instead of buffering it; the upstream response
+    # is closed once the last chunk has been sent.
+    upstream_resp = await client.send(
+        upstream_req, stream=True, follow_redirects=True
+    )
 
     # Copy response headers, excluding hop-by-hop headers.
     hop_by_hop = {
@@ -125,16 +155,29 @@ async def proxy_computer_demo(request: Request, path: str = "") -> Response:
         if k.lower() not in hop_by_hop
     }
 
-    return Response(
-        content=upstream_resp.content,
+    # Raw (still-encoded) bytes pair with the forwarded content-encoding and
+    # content-length headers, so nothing is decompressed and recompressed here.
+    # The upstream response is closed in a finally block, since the
+    # background task doesn't run if the client disconnects mid-stream; the
+    # background task still covers a body that is never iterated.
+    async def body() -> AsyncIterator[bytes]:
+        try:
+            async for chunk in upstream_resp.aiter_raw(chunk_size=65536):
+                yield chunk
+        finally:
+            await upstream_resp.aclose()
+
+    return StreamingResponse(
+        body(),
         status_code=upstream_resp.status_code,
         headers=headers,
         media_type=upstream_resp.headers.get("content-type"),
+        background=BackgroundTask(upstream_resp.aclose),
     )
 
 
-@app.post("/api/opus-computer/task", response_model=OpusComputerTaskResponse)
-async def opus_computer_task(body: OpusComputerTaskRequest) -> OpusComputerTaskResponse:
+@app.post("/api/opus-computer/task")
+async def opus_computer_task(body: OpusComputerTaskRequest) -> dict[str, str]:
     try:
         output = await run_opus_task_in_container(
             body.task,
@@ -142,6 +185,8 @@ async def opus_computer_task(body: OpusComputerTaskRequest) -> OpusComputerTaskR
             container=body.container,
             model=body.model,
             tool_version=body.tool_version,
+            max_steps=body.max_steps,
+            max_output_bytes=body.max_output_bytes,
         )
     except asyncio.TimeoutError:
         raise HTTPException(
@@ -151,12 +196,16 @@ async def opus_computer_task(body: OpusComputerTaskRequest) -> OpusComputerTaskR
     except Exception as e:
         raise HTTPException(status_code=500, detail={"message": str(e)})
 
-    return OpusComputerTaskResponse(output=output)
+    # The output can be large; a plain dict is serialized straight to JSON
+    # bytes without building a response model instance.
+    return {"output": output}
 
 
-@app.post("/api/realtime/ephemeral-key", response_model=EphemeralKeyResponse)
-async def create_ephemeral_key(body: EphemeralKeyRequest) -> EphemeralKeyResponse:
-    api_key = _get_openai_api_key()
+@app.post("/api/realtime/ephemeral-key")
+async def create_ephemeral_key(
+    request: Request, body: EphemeralKeyRequest
+) -> dict[str, Any]:
+    headers = _openai_headers()
 
     payload = {
         "expires_after": {
@@ -170,15 +219,10 @@ async def create_ephemeral_key(body: EphemeralKeyRequest) -> EphemeralKeyRespons
         },
     }
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        response = await client.post(
-            "https://api.openai.com/v1/realtime/client_secrets",
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-            },
-            json=payload,
-        )
+    client: httpx.AsyncClient = request.app.state.http
+    response = await client.post(
+        _OPENAI_CLIENT_SECRETS_URL, headers=headers, json=payload
+    )
 
     if response.status_code >= 400:
         try:
@@ -195,8 +239,10 @@ async def create_ephemeral_key(body: EphemeralKeyRequest) -> EphemeralKeyRespons
             detail={"message": "OpenAI response missing `value`", "raw": data},
         )
 
-    return EphemeralKeyResponse(
-        apiKey=value,
-        expires_at=data.get("expires_at"),
-        session=data.get("session"),
-    )
+    # The upstream fields are forwarded as-is in a plain dict rather than
+    # validated through a per-field response model.
+    return {
+        "apiKey": value,
+        "expires_at": data.get("expires_at"),
+        "session": data.get("session"),
+    }
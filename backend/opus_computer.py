@@ -1,11 +1,17 @@
 from __future__ import annotations
 
 import asyncio
-import base64
 import json
 import os
+import re
+import time
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
-from typing import Optional
+from typing import Any, AsyncIterator, Optional
+
+import httpx
 
 
 @dataclass(frozen=True)
@@ -20,21 +26,23 @@ async def _run_process(
     args: list[str],
     *,
     timeout_seconds: int,
-    stdin_text: str | None = None,
-) -> tuple[int, str, str]:
+    capture_stderr: bool = True,
+) -> tuple[int, str, bytes]:
+    """
+    Run a process and return (exit code, decoded stdout, raw stderr).
+
+    stderr is left undecoded since callers only look at it on failure; with
+    capture_stderr=False it goes to /dev/null and b"" is returned.
+    """
     proc = await asyncio.create_subprocess_exec(
         *args,
-        stdin=asyncio.subprocess.PIPE if stdin_text is not None else None,
         stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE if capture_stderr else asyncio.subprocess.DEVNULL,
     )
 
     try:
         stdout_bytes, stderr_bytes = await asyncio.wait_for(
-            proc.communicate(
-                stdin_text.encode("utf-8") if stdin_text is not None else None
-            ),
-            timeout=timeout_seconds,
+            proc.communicate(), timeout=timeout_seconds
         )
     except asyncio.TimeoutError:
         proc.kill()
@@ -42,24 +50,77 @@ async def _run_process(
         raise
 
     stdout = stdout_bytes.decode("utf-8", errors="replace") if stdout_bytes else ""
-    stderr = stderr_bytes.decode("utf-8", errors="replace") if stderr_bytes else ""
-    return proc.returncode or 0, stdout, stderr
+    return proc.returncode or 0, stdout, stderr_bytes or b""
 
 
-async def find_computer_use_demo_container() -> Optional[ComputerUseDemoContainer]:
-    """
-    Best-effort detection of the running computer-use-demo container.
+_DEFAULT_DOCKER_SOCKET = "/var/run/docker.sock"
 
-    Prefers containers that expose port 8080 and look like the anthropic computer-use-demo image.
-    """
+_docker_client: httpx.AsyncClient | None = None
+
+
+def _docker_socket_path() -> str | None:
+    host = os.getenv("DOCKER_HOST")
+    if not host:
+        return _DEFAULT_DOCKER_SOCKET
+    if host.startswith("unix://"):
+        return host[len("unix://") :]
+    # tcp:// and ssh:// hosts are left to the docker CLI.
+    return None
+
+
+def _get_docker_client() -> httpx.AsyncClient | None:
+    global _docker_client
+    if _docker_client is None:
+        socket_path = _docker_socket_path()
+        if socket_path is None or not os.path.exists(socket_path):
+            return None
+        _docker_client = httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(uds=socket_path),
+            base_url="http://docker",
+            timeout=5,
+        )
+    return _docker_client
+
+
+def _format_ports(ports: list[dict[str, Any]] | None) -> str:
+    # Same shape as the `docker ps` Ports column, e.g. "0.0.0.0:8080->8080/tcp".
+    formatted = []
+    for port in ports or []:
+        private = f"{port.get('PrivatePort')}/{port.get('Type', 'tcp')}"
+        public = port.get("PublicPort")
+        if not public:
+            formatted.append(private)
+        elif port.get("IP"):
+            formatted.append(f"{port['IP']}:{public}->{private}")
+        else:
+            formatted.append(f"{public}->{private}")
+    return ", ".join(formatted)
+
+
+async def _list_containers_api(client: httpx.AsyncClient) -> list[ComputerUseDemoContainer]:
+    resp = await client.get("/containers/json")
+    resp.raise_for_status()
+    return [
+        ComputerUseDemoContainer(
+            id=c["Id"],
+            image=c.get("Image") or "",
+            name=",".join(n.lstrip("/") for n in c.get("Names") or []),
+            ports=_format_ports(c.get("Ports")),
+        )
+        for c in resp.json()
+    ]
+
+
+async def _list_containers_cli() -> list[ComputerUseDemoContainer]:
     code, stdout, _stderr = await _run_process(
         ["docker", "ps", "--format", "{{.ID}}|{{.Image}}|{{.Names}}|{{.Ports}}"],
         timeout_seconds=5,
+        capture_stderr=False,
     )
     if code != 0:
-        return None
+        return []
 
-    candidates: list[ComputerUseDemoContainer] = []
+    containers: list[ComputerUseDemoContainer] = []
     for raw_line in stdout.splitlines():
         line = raw_line.strip()
         if not line:
@@ -68,9 +129,64 @@ async def find_computer_use_demo_container() -> Optional[ComputerUseDemoContaine
         if len(parts) != 4:
             continue
         container_id, image, name, ports = parts
-        candidates.append(
+        containers.append(
             ComputerUseDemoContainer(id=container_id, image=image, name=name, ports=ports)
         )
+    return containers
+
+
+_FULL_CONTAINER_ID = re.compile(r"[0-9a-f]{64}")
+
+
+async def _resolve_container_id(container: str) -> str:
+    """
+    Return the full ID of a container given its name or (short) ID.
+
+    Worker pools are keyed by it, so a container named one way and addressed
+    by ID another doesn't get two pools. If the container can't be inspected
+    the value is returned unchanged and `docker exec` reports the error.
+    """
+    if _FULL_CONTAINER_ID.fullmatch(container):
+        return container
+    client = _get_docker_client()
+    if client is not None:
+        try:
+            resp = await client.get(f"/containers/{container}/json")
+            if resp.status_code == 404:
+                return container
+            resp.raise_for_status()
+            return resp.json()["Id"]
+        except (httpx.HTTPError, ValueError, KeyError):
+            pass
+    try:
+        code, stdout, _stderr = await _run_process(
+            ["docker", "inspect", "--format", "{{.Id}}", container],
+            timeout_seconds=5,
+            capture_stderr=False,
+        )
+    except (OSError, asyncio.TimeoutError):
+        return container
+    container_id = stdout.strip()
+    return container_id if code == 0 and container_id else container
+
+
+async def find_computer_use_demo_container() -> Optional[ComputerUseDemoContainer]:
+    """
+    Best-effort detection of the running computer-use-demo container.
+
+    Prefers containers that expose port 8080 and look like the anthropic computer-use-demo image.
+    Lists containers through the Docker Engine API on the local socket, falling back to
+    `docker ps` when the socket isn't reachable.
+    """
+    candidates: list[ComputerUseDemoContainer] | None = None
+    client = _get_docker_client()
+    if client is not None:
+        try:
+            candidates = await _list_containers_api(client)
+        except (httpx.HTTPError, ValueError, KeyError):
+            candidates = None
+    if candidates is None:
+        candidates = await _list_containers_cli()
 
     if not candidates:
         return None
@@ -92,50 +208,50 @@ async def find_computer_use_demo_container() -> Optional[ComputerUseDemoContaine
     return best
 
 
-_OPUS_RUNNER_SCRIPT = r"""
+_OPUS_WORKER_SCRIPT = r"""
 import asyncio
-import base64
 import json
 import os
 import sys
+import traceback
 
 from computer_use_demo.loop import APIProvider, sampling_loop
 
+# The real stdout carries one JSON result per line; route stray prints from
+# the sampling loop and tools to stderr so they can't corrupt the protocol.
+_PROTOCOL_OUT = sys.stdout
+sys.stdout = sys.stderr
 
-def _read_task() -> str:
-    task_b64 = os.environ.get("OPUS_TASK_B64", "")
-    if not task_b64:
-        raise RuntimeError("Missing OPUS_TASK_B64")
-    raw = base64.urlsafe_b64decode(task_b64.encode("utf-8"))
-    data = json.loads(raw.decode("utf-8"))
-    task = data.get("task")
-    if not isinstance(task, str) or not task.strip():
-        raise RuntimeError("Invalid task")
-    return task.strip()
+# Lead a process group, so killing the worker from inside the container also
+# reaches anything its tools spawned.
+os.setpgrp()
 
 
-def _extract_final_text(messages):
-    for msg in reversed(messages):
-        if isinstance(msg, dict) and msg.get("role") == "assistant":
-            content = msg.get("content") or []
-            if not isinstance(content, list):
-                continue
-            texts = []
-            for block in content:
-                if isinstance(block, dict) and block.get("type") == "text":
-                    text = block.get("text")
-                    if isinstance(text, str) and text.strip():
-                        texts.append(text)
-            return "\n".join(texts).strip()
-    return ""
+class StepLimitReached(Exception):
+    pass
 
 
-async def main() -> int:
-    task = _read_task()
+async def run_job(job, task) -> str:
+    task = task.strip()
+    if not task:
+        raise RuntimeError("Invalid task")
 
-    model = os.environ.get("OPUS_MODEL") or os.environ.get("MODEL") or "claude-opus-4-5-20251101"
-    tool_version = os.environ.get("OPUS_TOOL_VERSION") or "computer_use_20251124"
+    model = (
+        job.get("model")
+        or os.environ.get("OPUS_MODEL")
+        or os.environ.get("MODEL")
+        or "claude-opus-4-5-20251101"
+    )
+    tool_version = (
+        job.get("tool_version")
+        or os.environ.get("OPUS_TOOL_VERSION")
+        or "computer_use_20251124"
+    )
     max_tokens = int(os.environ.get("OPUS_MAX_TOKENS") or "2048")
+    max_steps = int(job.get("max_steps") or os.environ.get("OPUS_MAX_STEPS") or "50")
+    max_output_bytes = int(
+        job.get("max_output_bytes") or os.environ.get("OPUS_MAX_OUTPUT_BYTES") or "262144"
+    )
     only_n = os.environ.get("OPUS_ONLY_N_MOST_RECENT_IMAGES")
     only_n_images = int(only_n) if only_n else None
 
@@ -150,85 +266,422 @@ async def main() -> int:
         }
     ]
 
-    def output_callback(_block):
-        return None
+    # Text blocks of the latest assistant response, collected as the loop
+    # reports them instead of re-scanning the message history afterwards.
+    # sampling_loop reports each successful API response before its blocks.
+    final_texts = []
+    # Tool calls made so far. sampling_loop reports each tool_use block just
+    # before running the tool, so raising from the callback past max_steps
+    # unwinds the loop before that tool runs, bounding both runtime and
+    # message-history growth.
+    steps = 0
+
+    def output_callback(block):
+        nonlocal steps
+        if not isinstance(block, dict):
+            return
+        if block.get("type") == "text":
+            text = block.get("text")
+            if isinstance(text, str) and text.strip():
+                final_texts.append(text)
+        elif block.get("type") == "tool_use":
+            steps += 1
+            if steps > max_steps:
+                raise StepLimitReached
 
     def tool_output_callback(_result, _tool_use_id):
         return None
 
-    def api_response_callback(_request, _response, _err):
+    def api_response_callback(_request, _response, err):
+        if err is None:
+            final_texts.clear()
+
+    try:
+        await sampling_loop(
+            model=model,
+            provider=APIProvider.ANTHROPIC,
+            system_prompt_suffix="",
+            messages=messages,
+            output_callback=output_callback,
+            tool_output_callback=tool_output_callback,
+            api_response_callback=api_response_callback,
+            api_key=api_key,
+            only_n_most_recent_images=only_n_images,
+            max_tokens=max_tokens,
+            tool_version=tool_version,
+        )
+    except StepLimitReached:
+        final_texts.append(f"[stopped after {max_steps} steps]")
+
+    output = "\n".join(final_texts).strip()
+    encoded = output.encode("utf-8")
+    if len(encoded) > max_output_bytes:
+        # The marker counts against the cap too
+        marker = f"\n[output truncated to {max_output_bytes} bytes]"
+        keep = max(0, max_output_bytes - len(marker.encode("utf-8")))
+        output = encoded[:keep].decode("utf-8", errors="ignore") + marker
+    return output
+
+
+def _read_job():
+    # Each job is a JSON header line followed by `task_len` bytes of raw
+    # UTF-8 task text, so the prompt itself needs no escaping or encoding.
+    header = sys.stdin.buffer.readline()
+    if not header:
+        return None
+    job = json.loads(header)
+    task_len = int(job["task_len"])
+    task_bytes = sys.stdin.buffer.read(task_len)
+    if len(task_bytes) != task_len:
         return None
+    return job, task_bytes.decode("utf-8", errors="replace")
 
-    out_messages = await sampling_loop(
-        model=model,
-        provider=APIProvider.ANTHROPIC,
-        system_prompt_suffix="",
-        messages=messages,
-        output_callback=output_callback,
-        tool_output_callback=tool_output_callback,
-        api_response_callback=api_response_callback,
-        api_key=api_key,
-        only_n_most_recent_images=only_n_images,
-        max_tokens=max_tokens,
-        tool_version=tool_version,
-    )
 
-    final_text = _extract_final_text(out_messages)
-    sys.stdout.write(final_text)
-    sys.stdout.flush()
-    return 0
+async def main() -> int:
+    # Run jobs until the host closes stdin.
+    while True:
+        framed = _read_job()
+        if framed is None:
+            return 0
+        try:
+            result = {"ok": True, "output": await run_job(*framed)}
+        except Exception:
+            result = {"ok": False, "error": traceback.format_exc()}
+        _PROTOCOL_OUT.write(json.dumps(result) + "\n")
+        _PROTOCOL_OUT.flush()
 
 
 if __name__ == "__main__":
     raise SystemExit(asyncio.run(main()))
 """.lstrip()
 
+# Run inside the container to kill the worker whose argv carries the given
+# tag, along with its process group. Killing the host-side `docker exec`
+# client alone leaves the in-container process running.
+_KILL_WORKER_SCRIPT = r"""
+import os
+import signal
+import sys
+
+tag = sys.argv[1].encode()
+for pid in os.listdir("/proc"):
+    if not pid.isdigit() or int(pid) == os.getpid():
+        continue
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            if tag not in f.read().split(b"\0"):
+                continue
+        try:
+            os.killpg(int(pid), signal.SIGKILL)
+        except ProcessLookupError:
+            # Not a group leader (setpgrp failed); kill just the worker
+            os.kill(int(pid), signal.SIGKILL)
+    except OSError:
+        pass
+""".lstrip()
+
+# Stderr kept from a worker for diagnosing why it died.
+_WORKER_STDERR_CAP = 256 * 1024
+# StreamReader limit for worker stdout; each result is a single JSON line.
+_WORKER_STREAM_LIMIT = 16 * 1024 * 1024
+
+
+class _OpusWorker:
+    """
+    A long-lived Python process inside the container that runs Opus tasks.
+
+    Starting the interpreter and importing `computer_use_demo.loop` happens
+    once per worker instead of once per task. Each job is written to stdin as
+    a JSON header line plus the raw task bytes, and answered with one JSON
+    line on stdout. A worker handles a single job at a time; see _WorkerPool.
+    """
+
+    def __init__(self, container: str, proc: asyncio.subprocess.Process, tag: str) -> None:
+        self.container = container
+        self.proc = proc
+        self.tag = tag
+        self._stderr = bytearray()
+        self._stderr_task = asyncio.create_task(self._drain_stderr())
+
+    @classmethod
+    async def start(cls, container: str) -> _OpusWorker:
+        # The tag is an otherwise unused argument that identifies this
+        # worker's process inside the container; see close().
+        tag = f"opus-worker-{uuid.uuid4().hex}"
+        proc = await asyncio.create_subprocess_exec(
+            "docker",
+            "exec",
+            "-i",
+            container,
+            "python",
+            "-c",
+            _OPUS_WORKER_SCRIPT,
+            tag,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=_WORKER_STREAM_LIMIT,
+        )
+        return cls(container, proc, tag)
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.returncode is None
+
+    async def _drain_stderr(self) -> None:
+        assert self.proc.stderr is not None
+        while True:
+            chunk = await self.proc.stderr.read(65536)
+            if not chunk:
+                return
+            room = _WORKER_STDERR_CAP - len(self._stderr)
+            if room > 0:
+                self._stderr += chunk[:room]
+
+    def _stderr_text(self) -> str:
+        return self._stderr.decode("utf-8", errors="replace").strip()
+
+    async def run(self, task: str, options: dict[str, Any]) -> dict[str, Any]:
+        assert self.proc.stdin is not None and self.proc.stdout is not None
+        task_bytes = task.encode("utf-8")
+        header = json.dumps({**options, "task_len": len(task_bytes)}).encode("utf-8")
+        try:
+            self.proc.stdin.writelines((header, b"\n", task_bytes))
+            await self.proc.stdin.drain()
+            line = await self.proc.stdout.readline()
+        except (BrokenPipeError, ConnectionResetError):
+            line = b""
+
+        if not line:
+            code = await self.proc.wait()
+            await self._stderr_task
+            raise RuntimeError(
+                f"Opus worker exited (exit {code}). stderr:\n{self._stderr_text()}"
+            )
+        return json.loads(line)
+
+    async def close(self) -> None:
+        if self.alive:
+            self.proc.kill()
+            await self.proc.wait()
+            # The job may still be running in the container; kill it there
+            # too so it doesn't keep going next to a replacement worker.
+            try:
+                await _run_process(
+                    [
+                        "docker", "exec", self.container,
+                        "python", "-c", _KILL_WORKER_SCRIPT, self.tag,
+                    ],
+                    timeout_seconds=5,
+                    capture_stderr=False,
+                )
+            except (OSError, asyncio.TimeoutError):
+                pass
+        self._stderr_task.cancel()
+
+
+# How long a worker may sit idle before it is stopped. A pool left with no
+# workers and no tasks is dropped as well.
+_WORKER_IDLE_TIMEOUT_SECONDS = 300.0
+
+
+class _WorkerPool:
+    """
+    Up to `size` Opus workers for one container.
+
+    Each task checks out an idle worker (starting one if none is idle) and
+    gets it to itself for the duration of the task, so at most `size` tasks
+    run against the container at once; the rest wait for a free slot.
+    Workers idle for _WORKER_IDLE_TIMEOUT_SECONDS are stopped.
+    """
+
+    def __init__(self, container: str, size: int) -> None:
+        self.container = container
+        self._slots = asyncio.Semaphore(size)
+        # Idle workers and when each went idle, least recently used first
+        self._idle: deque[tuple[_OpusWorker, float]] = deque()
+        self._workers: set[_OpusWorker] = set()
+        # Tasks holding or waiting for a slot
+        self._users = 0
+        self._reaper: asyncio.Task[None] | None = None
+
+    @asynccontextmanager
+    async def checkout(self) -> AsyncIterator[_OpusWorker]:
+        self._users += 1
+        try:
+            async with self._slots:
+                worker = None
+                while worker is None and self._idle:
+                    candidate, _ = self._idle.pop()
+                    if candidate.alive:
+                        worker = candidate
+                    else:
+                        await self._discard(candidate)
+                if worker is None:
+                    worker = await _OpusWorker.start(self.container)
+                    self._workers.add(worker)
+
+                try:
+                    yield worker
+                except BaseException:
+                    # Timed out, cancelled or died mid-job: the worker's stdout
+                    # is no longer in a known state, so replace it.
+                    await self._discard(worker)
+                    raise
+                self._idle.append((worker, time.monotonic()))
+                if self._reaper is None:
+                    self._reaper = asyncio.create_task(self._reap_idle())
+        finally:
+            self._users -= 1
+            self._evict_if_unused()
+
+    async def _reap_idle(self) -> None:
+        """Stop workers as they pass the idle timeout, until none are idle."""
+        while self._idle:
+            worker, idle_since = self._idle[0]
+            delay = idle_since + _WORKER_IDLE_TIMEOUT_SECONDS - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            self._idle.popleft()
+            await self._discard(worker)
+        self._reaper = None
+        self._evict_if_unused()
+
+    def _evict_if_unused(self) -> None:
+        # Drop the pool once it holds no workers and no task needs it, so
+        # containers that are no longer targeted don't keep one around.
+        if not self._workers and not self._users and _pools.get(self.container) is self:
+            del _pools[self.container]
+
+    async def _discard(self, worker: _OpusWorker) -> None:
+        self._workers.discard(worker)
+        await worker.close()
+
+    async def close(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        self._idle.clear()
+        workers = list(self._workers)
+        self._workers.clear()
+        for worker in workers:
+            await worker.close()
+
+
+_pools: dict[str, _WorkerPool] = {}
+
+
+def _get_pool(container: str) -> _WorkerPool:
+    pool = _pools.get(container)
+    if pool is None:
+        size = max(1, int(os.getenv("OPUS_MAX_CONCURRENCY") or "2"))
+        pool = _pools[container] = _WorkerPool(container, size)
+    return pool
+
+
+async def shutdown() -> None:
+    """Stop all Opus workers and close the Docker API client."""
+    global _docker_client
+    pools = list(_pools.values())
+    _pools.clear()
+    for pool in pools:
+        await pool.close()
+    if _docker_client is not None:
+        await _docker_client.aclose()
+        _docker_client = None
+
+
+# How long an auto-detected container ID is trusted before `docker ps` runs again.
+_CONTAINER_CACHE_TTL_SECONDS = 30.0
+# docker exec stderr fragments meaning the cached container no longer exists.
+_CONTAINER_GONE_MARKERS = ("No such container", "is not running")
+
+_container_cache: tuple[str, float] | None = None
+_container_cache_lock = asyncio.Lock()
+# Most recently auto-detected container, kept across cache expiry so its
+# worker pool can be closed once a different container is detected.
+_detected_container: str | None = None
+
+
+async def _detect_container_cached() -> str:
+    global _container_cache, _detected_container
+    async with _container_cache_lock:
+        now = time.monotonic()
+        if _container_cache and now - _container_cache[1] < _CONTAINER_CACHE_TTL_SECONDS:
+            return _container_cache[0]
 
-async def run_opus_task_in_container(
-    task: str,
-    *,
-    timeout_seconds: int,
-    container: str | None = None,
-    model: str | None = None,
-    tool_version: str | None = None,
-) -> str:
-    resolved_container = container or os.getenv("COMPUTER_USE_DEMO_CONTAINER")
-    if not resolved_container:
         detected = await find_computer_use_demo_container()
         if not detected:
             raise RuntimeError(
                 "Could not find a running computer-use-demo container. "
                 "Start it and ensure it exposes port 8080."
             )
-        resolved_container = detected.id
-
-    task_payload = {"task": task}
-    task_b64 = base64.urlsafe_b64encode(
-        json.dumps(task_payload).encode("utf-8")
-    ).decode("utf-8")
-
-    docker_args = [
-        "docker",
-        "exec",
-        "-i",
-        "-e",
-        f"OPUS_TASK_B64={task_b64}",
-    ]
+        container_id = await _resolve_container_id(detected.id)
+        _container_cache = (container_id, now)
 
-    if model:
-        docker_args.extend(["-e", f"OPUS_MODEL={model}"])
-    if tool_version:
-        docker_args.extend(["-e", f"OPUS_TOOL_VERSION={tool_version}"])
+        # The container was replaced (e.g. recreated with a new ID): its
+        # workers can't be reused, so stop them instead of leaving them idle.
+        previous, _detected_container = _detected_container, container_id
+        if previous is not None and previous != container_id:
+            stale_pool = _pools.pop(previous, None)
+            if stale_pool is not None:
+                await stale_pool.close()
+        return container_id
 
-    docker_args.extend([resolved_container, "python", "-"])
 
-    code, stdout, stderr = await _run_process(
-        docker_args,
-        timeout_seconds=timeout_seconds,
-        stdin_text=_OPUS_RUNNER_SCRIPT,
-    )
+def _invalidate_container_cache() -> None:
+    global _container_cache
+    _container_cache = None
 
-    if code != 0:
-        raise RuntimeError(f"Opus task failed (exit {code}). stderr:\n{stderr.strip()}")
 
-    return stdout.strip() if stdout else ""
+async def _run_job(
+    container: str, task: str, options: dict[str, Any], timeout_seconds: int
+) -> dict[str, Any]:
+    async def job() -> dict[str, Any]:
+        async with _get_pool(container).checkout() as worker:
+            return await worker.run(task, options)
+
+    # The deadline also covers waiting for a free slot and starting a worker.
+    return await asyncio.wait_for(job(), timeout=timeout_seconds)
+
+
+async def run_opus_task_in_container(
+    task: str,
+    *,
+    timeout_seconds: int,
+    container: str | None = None,
+    model: str | None = None,
+    tool_version: str | None = None,
+    max_steps: int | None = None,
+    max_output_bytes: int | None = None,
+) -> str:
+    options = {
+        "model": model,
+        "tool_version": tool_version,
+        "max_steps": max_steps,
+        "max_output_bytes": max_output_bytes,
+    }
+
+    explicit_container = container or os.getenv("COMPUTER_USE_DEMO_CONTAINER")
+    if explicit_container:
+        container_id = await _resolve_container_id(explicit_container)
+        result = await _run_job(container_id, task, options, timeout_seconds)
+    else:
+        detected = await _detect_container_cached()
+        try:
+            result = await _run_job(detected, task, options, timeout_seconds)
+        except RuntimeError as e:
+            if not any(marker in str(e) for marker in _CONTAINER_GONE_MARKERS):
+                raise
+            # The cached container went away (e.g. it was restarted); look it
+            # up again and retry once.
+            _invalidate_container_cache()
+            detected = await _detect_container_cached()
+            result = await _run_job(detected, task, options, timeout_seconds)
+
+    if not result.get("ok"):
+        raise RuntimeError(f"Opus task failed:\n{str(result.get('error', '')).strip()}")
+
+    output = result.get("output")
+    return output.strip() if isinstance(output, str) else ""
@@ -9,21 +9,152 @@ the OpenAI Realtime Agent's function calling system.
 """
 
 import asyncio
+import base64
+import collections
+import json
 import logging
+import mmap
 import os
-import subprocess
+import re
+import shlex
+import shutil
+import signal
+import sys
+import threading
 from pathlib import Path
 from typing import Optional
 
 from agents import function_tool
 
 from claude_code_manager import ClaudeCodeManager
+from websocket_handler import output_stream_sink
 
 logger = logging.getLogger(__name__)
 
+# Whether ripgrep is installed; checked once at import instead of spawning
+# `rg --version` on every search.
+_HAS_RIPGREP = shutil.which("rg") is not None
+
+# How much of the Claude Code output ask_claude_code returns when the full
+# output is streamed to the frontend as it arrives.
+_CLAUDE_OUTPUT_TAIL_CHARS = 16 * 1024
+
+# Maximum number of matching lines returned by search_codebase.
+_MAX_SEARCH_MATCHES = 200
+
+# Longest matched line returned by search_codebase; longer (e.g. minified)
+# lines are cut to a preview.
+_MAX_SEARCH_COLUMNS = 200
+
+# Files larger than this are not read whole: read_file returns the first and
+# last _READ_FILE_EDGE_BYTES with a truncation marker in between.
+_READ_FILE_MAX_BYTES = 2 * 1024 * 1024
+_READ_FILE_EDGE_BYTES = 512 * 1024
+
+# Files up to this size are read in one go with read_bytes() + decode; larger
+# ones are memory-mapped and decoded straight from the mapping, skipping the
+# copy into a bytes object.
+_MMAP_MIN_SIZE = 1024 * 1024
+
+# StreamReader limit for tool subprocess pipes, and the size of each read
+# from them. asyncio reads unbounded pipes (communicate(), read()) in blocks of
+# the limit, so output is pulled in 64 KiB batches rather than small reads.
+_PIPE_READ_SIZE = 64 * 1024
+
+# Budget for read_file's cache, measured as the memory held by the cached
+# strings (up to 4 bytes per character for non-ASCII text). Least recently
+# used entries are evicted to stay under it, and a file whose text alone
+# takes more than _READ_CACHE_MAX_ENTRY_BYTES is never cached.
+_READ_CACHE_MAX_BYTES = 32 * 1024 * 1024
+_READ_CACHE_MAX_ENTRY_BYTES = 4 * 1024 * 1024
+
+# Pseudo-filesystems whose files report a constant mtime and size while
+# their content changes, so they are always read fresh.
+_UNCACHED_PREFIXES = ("/proc/", "/sys/")
+
+_read_cache: collections.OrderedDict[tuple[str, int, int], str] = collections.OrderedDict()
+_read_cache_bytes = 0
+_read_cache_lock = threading.Lock()
+
+# Most formatted match output collected before a search is stopped early.
+_MAX_SEARCH_BYTES = 1024 * 1024
+
+# Longest single line of rg/grep output buffered while looking for its end.
+# Longer lines (e.g. a match in a minified file) are not kept whole: grep's
+# are cut to a preview, and an rg record is reduced to its file path.
+_MAX_SEARCH_RECORD_BYTES = 256 * 1024
+
+# The path of an `rg --json` match record, which comes before the matched
+# text, so it can still be read from a record too long to parse.
+_RG_RECORD_PATH = re.compile(rb'^\{"type":"match","data":\{"path":\{"text":("(?:[^"\\]|\\.)*")')
+
+# Globs that map onto a ripgrep file type, which rg matches faster than a glob.
+_RG_TYPES = {
+    "*.py": "py",
+    "*.ts": "ts",
+    "*.js": "js",
+    "*.go": "go",
+    "*.rs": "rust",
+}
+
+
+# Characters that need a shell to mean what they say (pipes, redirection,
+# expansion, globbing, ...); commands containing any of them aren't exec'd
+# directly.
+_SHELL_METACHARS = frozenset("|&;<>()$`\\*?[]{}~#!\n")
+
+
+def _exec_argv(command: str) -> Optional[list[str]]:
+    """
+    Split a simple command into an argv that can be exec'd without a shell.
+
+    Returns None when the command needs a shell: it uses shell syntax, can't
+    be tokenized, or its program isn't an executable on PATH (e.g. a builtin
+    like `cd`, or a relative path, which would resolve against the wrong
+    directory here).
+    """
+    if _SHELL_METACHARS.intersection(command):
+        return None
+    try:
+        argv = shlex.split(command)
+    except ValueError:
+        return None
+    if not argv or ("/" in argv[0] and not os.path.isabs(argv[0])):
+        return None
+    if shutil.which(argv[0]) is None:
+        return None
+    return argv
+
+
+def _kill_group(proc: asyncio.subprocess.Process) -> None:
+    """SIGKILL a process started with start_new_session=True and its children."""
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+async def _communicate(proc: asyncio.subprocess.Process, timeout: float) -> tuple[str, str]:
+    """
+    Wait for a subprocess to finish and return its decoded stdout and stderr.
+
+    Kills the process group and re-raises asyncio.TimeoutError if it doesn't
+    finish within `timeout` seconds. The process must have been started with
+    start_new_session=True, so that children holding the pipes open (e.g.
+    commands run by a shell) are killed too.
+    """
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+    except asyncio.TimeoutError:
+        _kill_group(proc)
+        await proc.wait()
+        raise
+    return stdout.decode('utf-8', errors='replace'), stderr.decode('utf-8', errors='replace')
+
 
 # Global Claude Code manager instance
-# This is shared across all function calls to maintain process state
+# This is shared across all function calls so the spare process it starts
+# ahead of time is reused by the next task
 _claude_manager: Optional[ClaudeCodeManager] = None
 
 
@@ -45,8 +176,10 @@ async def ask_claude_code(task: str) -> str:
     """
     Ask Claude Code to perform a coding task.
 
-    This function spawns a Claude Code subprocess and executes the given task.
-    It streams the output and returns the complete result when finished.
+    This function runs the task in a fresh Claude Code process.
+    When called for a WebSocket client (see output_stream_sink), output is
+    streamed to it as it arrives and only the tail is returned when
+    finished; otherwise the full output is returned.
 
     Args:
         task: A natural language description of the coding task to perform.
@@ -56,8 +189,9 @@ async def ask_claude_code(task: str) -> str:
               - "Refactor the user service to use dependency injection"
 
     Returns:
-        str: The complete output from Claude Code, including any files modified,
-             commands run, and summary of changes made.
+        str: The output from Claude Code, ending with its summary of the
+             changes made. Cut to the last _CLAUDE_OUTPUT_TAIL_CHARS
+             characters when it was also streamed.
 
     Example:
         ```python
@@ -65,18 +199,35 @@ async def ask_claude_code(task: str) -> str:
         print(result)
         ```
     """
-    logger.info(f"Claude Code task requested: {task}")
+    logger.info("Claude Code task requested: %s", task)
 
     try:
         manager = _get_claude_manager()
-        output_lines = []
-
-        async for line in manager.run_task(task):
-            output_lines.append(line)
+        sink = output_stream_sink.get()
+        debug = logger.isEnabledFor(logging.DEBUG)
+        output: collections.deque[str] = collections.deque()
+        output_len = 0
+        total_len = 0
+
+        async for chunk in manager.run_task(task):
+            output.append(chunk)
+            total_len += len(chunk)
+            if sink is not None:
+                await sink(chunk)
+                # Only the most recent chunks are kept; older ones have
+                # already been streamed and are dropped
+                output_len += len(chunk)
+                while output_len - len(output[0]) >= _CLAUDE_OUTPUT_TAIL_CHARS:
+                    output_len -= len(output.popleft())
             # Optionally log progress
-            logger.debug(f"Claude Code output: {line.strip()}")
-
-        result = "".join(output_lines)
+            if debug:
+                logger.debug("Claude Code output: %s", chunk.strip())
+
+        result = "".join(output)
+        if sink is not None:
+            result = result[-_CLAUDE_OUTPUT_TAIL_CHARS:]
+        if total_len > len(result):
+            result = f"[{total_len - len(result)} earlier characters omitted]\n" + result
         logger.info("Claude Code task completed successfully")
         return result
 
@@ -86,6 +237,60 @@ async def ask_claude_code(task: str) -> str:
         return error_msg
 
 
+def _read_text(path: str, size: int) -> str:
+    """
+    Read a file's text.
+
+    Files over _READ_FILE_MAX_BYTES are reduced to their head and tail.
+    """
+    if size > _READ_FILE_MAX_BYTES:
+        with open(path, 'rb') as f:
+            head = f.read(_READ_FILE_EDGE_BYTES)
+            f.seek(-_READ_FILE_EDGE_BYTES, os.SEEK_END)
+            tail = f.read()
+        omitted = size - len(head) - len(tail)
+        return (
+            head.decode('utf-8', errors='replace')
+            + f"\n\n…[truncated {omitted} bytes]…\n\n"
+            + tail.decode('utf-8', errors='replace')
+        )
+    if size <= _MMAP_MIN_SIZE:
+        return Path(path).read_bytes().decode('utf-8', errors='replace')
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return str(mm, 'utf-8', 'replace')
+
+
+def _read_cached(path: str, mtime_ns: int, size: int) -> str:
+    """
+    Read a file's text, memoized on (path, mtime, size).
+
+    The modification time and size are part of the key only so that a changed
+    file misses the cache; repeat reads of an unchanged file skip the disk.
+    The cache is an LRU bounded by the memory of the cached strings.
+    """
+    global _read_cache_bytes
+    key = (path, mtime_ns, size)
+    with _read_cache_lock:
+        text = _read_cache.get(key)
+        if text is not None:
+            _read_cache.move_to_end(key)
+            return text
+
+    text = _read_text(path, size)
+    cost = sys.getsizeof(text)
+    if cost > _READ_CACHE_MAX_ENTRY_BYTES:
+        return text
+
+    with _read_cache_lock:
+        if key not in _read_cache:
+            _read_cache[key] = text
+            _read_cache_bytes += cost
+            while _read_cache_bytes > _READ_CACHE_MAX_BYTES:
+                _, evicted = _read_cache.popitem(last=False)
+                _read_cache_bytes -= sys.getsizeof(evicted)
+    return text
+
+
 @function_tool
 def read_file(path: str) -> str:
     """
@@ -101,7 +306,8 @@ def read_file(path: str) -> str:
 
     Returns:
         str: The contents of the file, or an error message if the file
-             cannot be read.
+             cannot be read. Files over 2 MiB are truncated to their first
+             and last 512 KiB.
 
     Example:
         ```python
@@ -109,7 +315,7 @@ def read_file(path: str) -> str:
         print(content)
         ```
     """
-    logger.info(f"Reading file: {path}")
+    logger.info("Reading file: %s", path)
 
     try:
         file_path = Path(path).resolve()
@@ -121,11 +327,22 @@ def read_file(path: str) -> str:
         if not file_path.is_file():
             return f"Error: Path is not a file: {path}"
 
-        # Read the file
-        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-            content = f.read()
+        # Read the file (cached until it is modified)
+        resolved = str(file_path)
+        stat = file_path.stat()
+        if stat.st_size > _READ_FILE_MAX_BYTES:
+            logger.info(
+                "File %s is %s bytes; returning only the first and last %s bytes",
+                path,
+                stat.st_size,
+                _READ_FILE_EDGE_BYTES,
+            )
+        if resolved.startswith(_UNCACHED_PREFIXES):
+            content = _read_text(resolved, stat.st_size)
+        else:
+            content = _read_cached(resolved, stat.st_mtime_ns, stat.st_size)
 
-        logger.info(f"Successfully read file: {path} ({len(content)} characters)")
+        logger.info("Successfully read file: %s (%s characters)", path, len(content))
         return content
 
     except PermissionError:
@@ -140,12 +357,15 @@ def read_file(path: str) -> str:
 
 
 @function_tool
-def run_command(command: str, cwd: Optional[str] = None) -> str:
+async def run_command(command: str, cwd: Optional[str] = None) -> str:
     """
     Run a shell command in the project directory.
 
     This function executes a shell command and returns the output. It runs
-    commands synchronously with a timeout to prevent hanging.
+    commands asynchronously, so the event loop keeps serving other clients,
+    with a timeout to prevent hanging. Simple commands (a program on PATH and
+    its arguments) are run directly; anything using shell syntax goes
+    through /bin/sh.
 
     Args:
         command: The shell command to execute.
@@ -159,7 +379,7 @@ def run_command(command: str, cwd: Optional[str] = None) -> str:
 
     Example:
         ```python
-        result = run_command("git status")
+        result = await run_command("git status")
         print(result)
         ```
 
@@ -167,7 +387,7 @@ def run_command(command: str, cwd: Optional[str] = None) -> str:
         This function executes arbitrary shell commands. Ensure that commands
         come from trusted sources to avoid security issues.
     """
-    logger.info(f"Running command: {command}")
+    logger.info("Running command: %s", command)
 
     try:
         # Resolve working directory
@@ -176,31 +396,38 @@ def run_command(command: str, cwd: Optional[str] = None) -> str:
         if not working_dir.exists():
             return f"Error: Working directory does not exist: {cwd}"
 
-        # Execute the command with timeout
-        result = subprocess.run(
-            command,
-            shell=True,
+        # Execute the command with timeout; simple commands are exec'd
+        # directly, saving the extra /bin/sh process
+        spawn_kwargs = dict(
             cwd=working_dir,
-            capture_output=True,
-            text=True,
-            timeout=30,  # 30 second timeout
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=_PIPE_READ_SIZE,
+            start_new_session=True,
         )
+        argv = _exec_argv(command)
+        if argv is not None:
+            proc = await asyncio.create_subprocess_exec(*argv, **spawn_kwargs)
+        else:
+            logger.warning("Running command through the shell: %s", command)
+            proc = await asyncio.create_subprocess_shell(command, **spawn_kwargs)
+        stdout, stderr = await _communicate(proc, timeout=30)  # 30 second timeout
 
         # Combine stdout and stderr
         output = ""
-        if result.stdout:
-            output += result.stdout
-        if result.stderr:
-            output += f"\nstderr:\n{result.stderr}"
+        if stdout:
+            output += stdout
+        if stderr:
+            output += f"\nstderr:\n{stderr}"
 
         # Add return code if non-zero
-        if result.returncode != 0:
-            output += f"\n\nCommand exited with code {result.returncode}"
+        if proc.returncode != 0:
+            output += f"\n\nCommand exited with code {proc.returncode}"
 
-        logger.info(f"Command completed with return code {result.returncode}")
+        logger.info("Command completed with return code %s", proc.returncode)
         return output
 
-    except subprocess.TimeoutExpired:
+    except asyncio.TimeoutError:
         error_msg = f"Error: Command timed out after 30 seconds: {command}"
         logger.error(error_msg)
         return error_msg
@@ -212,7 +439,7 @@ def run_command(command: str, cwd: Optional[str] = None) -> str:
 
 
 @function_tool
-def search_codebase(pattern: str, path: Optional[str] = None, file_pattern: Optional[str] = None) -> str:
+async def search_codebase(pattern: str, path: Optional[str] = None, file_pattern: Optional[str] = None) -> str:
     """
     Search for code patterns in the codebase.
 
@@ -232,11 +459,11 @@ def search_codebase(pattern: str, path: Optional[str] = None, file_pattern: Opti
 
     Example:
         ```python
-        results = search_codebase("def login", path="src", file_pattern="*.py")
+        results = await search_codebase("def login", path="src", file_pattern="*.py")
         print(results)
         ```
     """
-    logger.info(f"Searching codebase for pattern: {pattern}")
+    logger.info("Searching codebase for pattern: %s", pattern)
 
     try:
         # Build the search command
@@ -246,22 +473,14 @@ def search_codebase(pattern: str, path: Optional[str] = None, file_pattern: Opti
         if not search_dir.exists():
             return f"Error: Search directory does not exist: {path}"
 
-        # Check if ripgrep is available
-        try:
-            subprocess.run(
-                ["rg", "--version"],
-                capture_output=True,
-                check=True,
-                timeout=1
-            )
-            use_rg = True
-        except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired):
-            use_rg = False
+        use_rg = _HAS_RIPGREP
 
         # Build command
         if use_rg:
-            cmd = ["rg", "--line-number", "--no-heading", "--color=never"]
-            if file_pattern:
+            cmd = ["rg", "--json", "--no-messages", "--max-count", str(_MAX_SEARCH_MATCHES)]
+            if file_pattern in _RG_TYPES:
+                cmd.append(f"--type={_RG_TYPES[file_pattern]}")
+            elif file_pattern:
                 cmd.extend(["--glob", file_pattern])
             cmd.extend([pattern, str(search_dir)])
         else:
@@ -271,30 +490,48 @@ def search_codebase(pattern: str, path: Optional[str] = None, file_pattern: Opti
             cmd.extend([pattern, str(search_dir)])
 
         # Execute search
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=30,
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=_PIPE_READ_SIZE,
+            start_new_session=True,
         )
-
+        stderr_task = asyncio.create_task(proc.stderr.read())
+        try:
+            matches, truncated = await asyncio.wait_for(
+                _read_search_matches(proc, use_rg), timeout=30
+            )
+            await proc.wait()
+            stderr = (await stderr_task).decode('utf-8', errors='replace')
+        except asyncio.TimeoutError:
+            _kill_group(proc)
+            await proc.wait()
+            raise
+        finally:
+            stderr_task.cancel()
+
+        if matches:
+            logger.info("Found %s matches for pattern: %s", len(matches), pattern)
+            output = "\n".join(matches) + "\n"
+            if truncated:
+                output += f"[results truncated after {len(matches)} matches]\n"
+            return output
         # Note: grep returns non-zero if no matches found, which is not an error
-        if result.returncode == 0:
-            matches = result.stdout
-            match_count = len(matches.strip().split('\n')) if matches.strip() else 0
-            logger.info(f"Found {match_count} matches for pattern: {pattern}")
-            return matches if matches else "No matches found."
-        elif result.returncode == 1:
+        elif truncated:
+            logger.info("Search for pattern %s stopped before any match was collected", pattern)
+            return "Search stopped early before any match was collected."
+        elif proc.returncode in (0, 1):
             # No matches found (grep convention)
-            logger.info(f"No matches found for pattern: {pattern}")
+            logger.info("No matches found for pattern: %s", pattern)
             return "No matches found."
         else:
             # Actual error
-            error_msg = f"Search failed: {result.stderr}"
+            error_msg = f"Search failed: {stderr}"
             logger.error(error_msg)
             return error_msg
 
-    except subprocess.TimeoutExpired:
+    except asyncio.TimeoutError:
         error_msg = f"Error: Search timed out after 30 seconds"
         logger.error(error_msg)
         return error_msg
@@ -305,6 +542,119 @@ def search_codebase(pattern: str, path: Optional[str] = None, file_pattern: Opti
         return error_msg
 
 
+def _rg_text(field: Optional[dict]) -> str:
+    """Extract text from an `rg --json` data field (non-UTF-8 data is base64)."""
+    if not field:
+        return ""
+    if "text" in field:
+        return field["text"]
+    return base64.b64decode(field.get("bytes", "")).decode('utf-8', errors='replace')
+
+
+def _clip_line(text: str) -> str:
+    """Cut a matched line to _MAX_SEARCH_COLUMNS characters."""
+    if len(text) <= _MAX_SEARCH_COLUMNS:
+        return text
+    omitted = len(text) - _MAX_SEARCH_COLUMNS
+    return f"{text[:_MAX_SEARCH_COLUMNS]} [... {omitted} more characters]"
+
+
+def _format_rg_match(raw_line: bytes) -> Optional[str]:
+    """
+    Convert one `rg --json` record into `path:line_number:line` text.
+
+    Returns None for anything but "match" records; rg also emits
+    begin/end/summary records around them.
+    """
+    try:
+        record = json.loads(raw_line)
+    except ValueError:
+        return None
+    if record.get("type") != "match":
+        return None
+
+    data = record["data"]
+    path = _rg_text(data.get("path"))
+    text = _rg_text(data.get("lines")).rstrip("\r\n")
+    return f"{path}:{data.get('line_number')}:{_clip_line(text)}"
+
+
+def _format_overlong_record(prefix: bytes, use_rg: bool) -> Optional[str]:
+    """
+    Describe an output line longer than _MAX_SEARCH_RECORD_BYTES from its start.
+
+    A grep line is cut to a preview. An `rg --json` record can't be
+    parsed from a prefix, so only its path is reported; non-match records and
+    records with non-UTF-8 paths return None.
+    """
+    if not use_rg:
+        text = prefix.decode('utf-8', errors='replace')[:_MAX_SEARCH_COLUMNS]
+        return f"{text} [... rest of a line over {_MAX_SEARCH_RECORD_BYTES} bytes omitted]"
+    found = _RG_RECORD_PATH.match(prefix)
+    if not found:
+        return None
+    return f"{json.loads(found.group(1))}: [matching line over {_MAX_SEARCH_RECORD_BYTES} bytes omitted]"
+
+
+async def _read_search_matches(
+    proc: asyncio.subprocess.Process, use_rg: bool
+) -> tuple[list[str], bool]:
+    """
+    Collect formatted match lines from a running rg/grep process as they arrive.
+
+    Stops early and kills the search once _MAX_SEARCH_MATCHES lines or
+    _MAX_SEARCH_BYTES of formatted output have been collected, so a huge
+    result set is never fully materialized. At most _MAX_SEARCH_RECORD_BYTES
+    of an unfinished line are buffered; the rest of a longer line is skipped.
+
+    Returns:
+        tuple: The match lines, and whether the search was cut short.
+    """
+    matches = []
+    pending = b""
+    output_bytes = 0
+    # Whether the rest of the current line is being skipped
+    overlong = False
+
+    def add(line: Optional[str]) -> bool:
+        """Collect a formatted line; True once a cap has been reached."""
+        nonlocal output_bytes
+        if not line:
+            return False
+        matches.append(line)
+        output_bytes += len(line.encode('utf-8')) + 1
+        return len(matches) >= _MAX_SEARCH_MATCHES or output_bytes >= _MAX_SEARCH_BYTES
+
+    while chunk := await proc.stdout.read(_PIPE_READ_SIZE):
+        *complete, tail = chunk.split(b"\n")
+        for piece in complete:
+            if overlong:
+                overlong = False
+                continue
+            raw_line, pending = pending + piece, b""
+            if use_rg:
+                line = _format_rg_match(raw_line)
+            else:
+                line = _clip_line(raw_line.decode('utf-8', errors='replace').rstrip("\r"))
+            if add(line):
+                _kill_group(proc)
+                return matches, True
+
+        if overlong:
+            continue
+        pending += tail
+        if len(pending) > _MAX_SEARCH_RECORD_BYTES:
+            overlong = True
+            line, pending = _format_overlong_record(pending, use_rg), b""
+            if add(line):
+                _kill_group(proc)
+                return matches, True
+
+    if pending and not use_rg:
+        add(_clip_line(pending.decode('utf-8', errors='replace')))
+    return matches, False
+
+
 # List of all available tools for export
 REALTIME_TOOLS = [
     ask_claude_code,
@@ -1,10 +1,13 @@
-import json
+import asyncio
 import logging
-from typing import Dict, Set
+import weakref
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, Optional
 from enum import Enum
 
+import msgspec
+import orjson
 from fastapi import WebSocket, WebSocketDisconnect
-from pydantic import BaseModel, ValidationError
 
 logger = logging.getLogger(__name__)
 
@@ -21,24 +24,69 @@ class MessageType(str, Enum):
     CONNECTION_ACK = "connection_ack"
 
 
-class WebSocketMessage(BaseModel):
+class WebSocketMessage(msgspec.Struct):
     """Base model for WebSocket messages."""
 
     type: MessageType
-    payload: Dict = {}
+    payload: Dict = msgspec.field(default_factory=dict)
+
+
+# Schema-guided decoder for inbound frames, built once
+_message_decoder = msgspec.json.Decoder(WebSocketMessage)
+
+
+# Pre-encoded JSON up to the payload for the hottest outbound types, so only
+# the payload has to be serialized per message
+_PREFIXES: Dict[MessageType, bytes] = {
+    message_type: b'{"type":' + orjson.dumps(message_type.value) + b',"payload":'
+    for message_type in (
+        MessageType.OUTPUT_STREAM,
+        MessageType.CONNECTION_ACK,
+        MessageType.ERROR,
+    )
+}
+
+
+# Complete error replies with a slot for the variable part, which is filled
+# with orjson-encoded JSON; nothing else is serialized on these paths
+_INVALID_FORMAT_TEMPLATE = (
+    b'{"type":"error","payload":{"error":"Invalid message format","details":%b}}'
+)
+_INVALID_JSON_TEMPLATE = (
+    b'{"type":"error","payload":{"error":"Invalid JSON","details":%b}}'
+)
+_UNHANDLED_TYPE_TEMPLATE = (
+    b'{"type":"error","payload":{"error":"Unhandled message type","type":%b}}'
+)
+
+
+def _encode(message_type: MessageType, payload: Dict) -> bytes:
+    """
+    Serialize an outbound message.
+
+    Outbound messages are built by the server, so they skip WebSocketMessage
+    validation and go straight through orjson; inbound messages are still
+    validated against it when decoded.
+    """
+    prefix = _PREFIXES.get(message_type)
+    if prefix is not None:
+        return prefix + orjson.dumps(payload) + b"}"
+    return orjson.dumps({"type": message_type.value, "payload": payload})
 
 
 class ConnectionManager:
     """Manages WebSocket connections and message broadcasting."""
 
     def __init__(self):
-        self.active_connections: Set[WebSocket] = set()
+        # Weak references, so a socket that is dropped without a disconnect()
+        # call doesn't stay registered
+        self.active_connections: weakref.WeakSet[WebSocket] = weakref.WeakSet()
 
     async def connect(self, websocket: WebSocket):
         """Accept and register a new WebSocket connection."""
         await websocket.accept()
         self.active_connections.add(websocket)
-        logger.info(f"WebSocket connected. Total connections: {len(self.active_connections)}")
+        logger.info("WebSocket connected. Total connections: %s", len(self.active_connections))
 
         # Send connection acknowledgment
         await self.send_message(
@@ -50,39 +98,63 @@ class ConnectionManager:
     async def disconnect(self, websocket: WebSocket):
         """Remove a WebSocket connection from the active set."""
         self.active_connections.discard(websocket)
-        logger.info(f"WebSocket disconnected. Total connections: {len(self.active_connections)}")
+        logger.info("WebSocket disconnected. Total connections: %s", len(self.active_connections))
 
     async def send_message(self, websocket: WebSocket, message_type: MessageType, payload: Dict):
-        """Send a JSON message to a specific WebSocket connection."""
-        message = WebSocketMessage(type=message_type, payload=payload)
+        """
+        Send a JSON message to a specific WebSocket connection.
+
+        Like broadcasts, every message is sent as a binary frame of UTF-8
+        JSON, so clients see one frame type.
+        """
+        await self.send_bytes(websocket, _encode(message_type, payload))
+
+    async def send_bytes(self, websocket: WebSocket, data: bytes):
+        """Send an already-encoded JSON message as a binary frame."""
         try:
-            await websocket.send_text(message.model_dump_json())
+            await websocket.send_bytes(data)
         except Exception as e:
-            logger.error(f"Error sending message: {e}")
+            logger.error("Error sending message: %s", e)
             await self.disconnect(websocket)
 
     async def broadcast(self, message_type: MessageType, payload: Dict):
-        """Broadcast a message to all active connections."""
-        message = WebSocketMessage(type=message_type, payload=payload)
-        message_json = message.model_dump_json()
-
-        disconnected = set()
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message_json)
-            except Exception as e:
-                logger.error(f"Error broadcasting to connection: {e}")
-                disconnected.add(connection)
+        """
+        Broadcast a message to all active connections.
+
+        The message is encoded to UTF-8 JSON once and sent as a binary frame,
+        so it isn't re-encoded for every connection.
+        """
+        message_bytes = _encode(message_type, payload)
+
+        # Send to all clients concurrently rather than one after another,
+        # iterating over a snapshot since connections can come and go while
+        # the sends are in flight
+        connections = tuple(self.active_connections)
+        results = await asyncio.gather(
+            *(connection.send_bytes(message_bytes) for connection in connections),
+            return_exceptions=True,
+        )
 
         # Clean up disconnected clients
-        for connection in disconnected:
-            await self.disconnect(connection)
+        for connection, result in zip(connections, results):
+            if isinstance(result, Exception):
+                logger.error("Error broadcasting to connection: %s", result)
+                await self.disconnect(connection)
 
 
 # Global connection manager instance
 manager = ConnectionManager()
 
 
+# Where tool output (e.g. from ask_claude_code) is streamed. Each connection
+# points it at its own socket in websocket_endpoint, so a task's output only
+# goes to the client that asked for it. None outside of a connection, where
+# tools return their full output instead.
+output_stream_sink: ContextVar[Optional[Callable[[str], Awaitable[None]]]] = ContextVar(
+    "output_stream_sink", default=None
+)
+
+
 async def websocket_endpoint(websocket: WebSocket):
     """
     WebSocket endpoint handler for frontend communication.
@@ -96,38 +168,41 @@ async def websocket_endpoint(websocket: WebSocket):
     """
     await manager.connect(websocket)
 
+    async def send_output(chunk: str) -> None:
+        await manager.send_message(websocket, MessageType.OUTPUT_STREAM, {"chunk": chunk})
+
+    # Each connection is served by its own task, so this only applies to
+    # handlers run for this socket
+    output_stream_sink.set(send_output)
+
     try:
         while True:
             # Receive and parse message
             data = await websocket.receive_text()
 
             try:
-                message = WebSocketMessage.model_validate_json(data)
-                logger.info(f"Received message: {message.type}")
+                message = _message_decoder.decode(data)
+                logger.info("Received message: %s", message.type.value)
 
                 # Handle different message types
                 await handle_message(websocket, message)
 
-            except ValidationError as e:
-                logger.error(f"Invalid message format: {e}")
-                await manager.send_message(
-                    websocket,
-                    MessageType.ERROR,
-                    {"error": "Invalid message format", "details": str(e)}
+            except msgspec.ValidationError as e:
+                logger.error("Invalid message format: %s", e)
+                await manager.send_bytes(
+                    websocket, _INVALID_FORMAT_TEMPLATE % orjson.dumps(str(e))
                 )
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON decode error: {e}")
-                await manager.send_message(
-                    websocket,
-                    MessageType.ERROR,
-                    {"error": "Invalid JSON", "details": str(e)}
+            except msgspec.DecodeError as e:
+                logger.error("JSON decode error: %s", e)
+                await manager.send_bytes(
+                    websocket, _INVALID_JSON_TEMPLATE % orjson.dumps(str(e))
                 )
 
     except WebSocketDisconnect:
         logger.info("WebSocket disconnected by client")
         await manager.disconnect(websocket)
     except Exception as e:
-        logger.error(f"WebSocket error: {e}")
+        logger.error("WebSocket error: %s", e)
         await manager.disconnect(websocket)
 
 
@@ -139,21 +214,13 @@ async def handle_message(websocket: WebSocket, message: WebSocketMessage):
         websocket: The WebSocket connection
         message: Parsed WebSocket message
     """
-    if message.type == MessageType.VOICE_START:
-        await handle_voice_start(websocket, message.payload)
-
-    elif message.type == MessageType.VOICE_STOP:
-        await handle_voice_stop(websocket, message.payload)
-
-    elif message.type == MessageType.TASK_REQUEST:
-        await handle_task_request(websocket, message.payload)
-
+    handler = _HANDLERS.get(message.type)
+    if handler:
+        await handler(websocket, message.payload)
     else:
-        logger.warning(f"Unhandled message type: {message.type}")
-        await manager.send_message(
-            websocket,
-            MessageType.ERROR,
-            {"error": "Unhandled message type", "type": message.type}
+        logger.warning("Unhandled message type: %s", message.type.value)
+        await manager.send_bytes(
+            websocket, _UNHANDLED_TYPE_TEMPLATE % orjson.dumps(message.type.value)
         )
 
 
@@ -200,7 +267,7 @@ async def handle_task_request(websocket: WebSocket, payload: Dict):
     task = payload.get("task", "")
     context = payload.get("context", {})
 
-    logger.info(f"Task request received: {task}")
+    logger.info("Task request received: %s", task)
 
     # TODO: Process task with Claude Code
     # For now, send a mock response
@@ -213,3 +280,11 @@ async def handle_task_request(websocket: WebSocket, payload: Dict):
             "message": "Task received and queued for processing"
         }
     )
+
+
+# Handlers for inbound message types, looked up by handle_message
+_HANDLERS: Dict[MessageType, Callable[[WebSocket, Dict], Awaitable[None]]] = {
+    MessageType.VOICE_START: handle_voice_start,
+    MessageType.VOICE_STOP: handle_voice_stop,
+    MessageType.TASK_REQUEST: handle_task_request,
+}